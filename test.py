@@ -1,9 +1,39 @@
 import os
 import re
+import mmap
 import pandas as pd
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:
+    pa = pacsv = None
+
+# Lookup tables for unit suffixes, built once instead of per conversion
+_UNIT_FACTORS = {'kib': 1024, 'mib': 1 << 20, 'gib': 1 << 30, 'tib': 1 << 40}
+_SIZE_FACTORS = {b'K': 1024, b'k': 1024, b'M': 1 << 20, b'G': 1 << 30, b'T': 1 << 40}
+_TIME_FACTORS = {b'us': 1e3, b'ms': 1e6}
+
+def _compile_parser(patterns, fields):
+    """Generate a straight-line parser for the named fields of a {field: (compiled pattern, conversion)} table"""
+    # One search plus its conversion per field, so a block is parsed without
+    # iterating over the pattern table or unpacking tuples at runtime
+    namespace = {}
+    lines = ['def parse(content, start, end):', '    metrics = {}']
+    for index, field in enumerate(fields):
+        pattern, conv = patterns[field]
+        namespace[f'_P{index}'] = pattern
+        namespace[f'_C{index}'] = conv
+        lines.append(f'    match = _P{index}.search(content, start, end)')
+        lines.append(f'    metrics[{field!r}] = _C{index}(match.group(1)) if match else None')
+    lines.append('    return metrics')
+
+    exec('\n'.join(lines), namespace)
+    return namespace['parse']
+
 class NetworkSimulationProcessor:
     def __init__(self, simulation_path):
         self.sim_dir = Path(simulation_path)
@@ -11,240 +41,256 @@ class NetworkSimulationProcessor:
             raise FileNotFoundError(f"Directory not found: {simulation_path}")
         
         self.sim_id = self.sim_dir.name
-        self.results = []
+        self._sim_str = str(self.sim_dir)
+        # Results are accumulated column-wise over a fixed schema, None for absent fields
+        self.columns = {name: [] for name in self._COLUMNS}
+        self.row_count = 0
         self.valid_qdisc_types = ['pie', 'codel', 'dualpi2', 'fq_codel']
         
     @staticmethod
     def _convert_units(value, unit):
         """Convert storage units to bytes"""
-        unit = unit.lower()
-        conversions = {
-            'kib': 1024,
-            'mib': 1024**2,
-            'gib': 1024**3,
-            'tib': 1024**4
-        }
-        return value * conversions.get(unit, 1)
+        return value * _UNIT_FACTORS.get(unit.lower(), 1)
+
+    @staticmethod
+    def _convert_size(size):
+        """Convert a tc size such as b'32M' (bytes captured from qdisc output) to bytes"""
+        factor = _SIZE_FACTORS.get(size[-1:])
+        if factor:
+            return int(float(size[:-1]) * factor)
+        return int(float(size))
 
     @staticmethod
     def _convert_time(time_str):
-        """Convert time units to nanoseconds"""
+        """Convert time units (bytes captured from qdisc output) to nanoseconds"""
         if not time_str:
             return 0
-        if 'us' in time_str:
-            return float(time_str.replace('us', '')) * 1000
-        elif 'ms' in time_str:
-            return float(time_str.replace('ms', '')) * 1e6
+        factor = _TIME_FACTORS.get(time_str[-2:])
+        if factor:
+            return float(time_str[:-2]) * factor
         return float(time_str)
 
-    def _extract_metric(self, content, pattern, convert_func=None):
-        """Generic metric extractor with optional conversion"""
-        match = re.search(pattern, content)
-        if not match:
-            return None
-        value = match.group(1)
-        return convert_func(value) if convert_func else value
+    # Patterns are compiled once at class creation instead of on every block.
+    # Every field is declared once and shared by the qdisc types that report it
+    _FIELD_PATTERNS = {
+        'sent_bytes': (re.compile(rb'Sent (\d+) bytes'), int),
+        'sent_pkts': (re.compile(rb'Sent \d+ bytes (\d+) pkt'), int),
+        'dropped': (re.compile(rb'dropped (\d+)'), int),
+        'overlimits': (re.compile(rb'overlimits (\d+)'), int),
+        'requeues': (re.compile(rb'requeues (\d+)'), int),
+        'backlog_bytes': (re.compile(rb'backlog (\d+)b'), int),
+        'backlog_pkts': (re.compile(rb'backlog \d+b (\d+)p'), int),
+        'prob': (re.compile(rb'prob ([\d.]+)'), float),
+        'delay': (re.compile(rb'delay ([\d.]+(?:us|ms))'), _convert_time),
+        'pkts_in': (re.compile(rb'pkts_in (\d+)'), int),
+        'pkts_overlimit': (re.compile(rb'overlimit (\d+)'), int),
+        'maxq': (re.compile(rb'maxq (\d+)'), int),
+        'ecn_mark': (re.compile(rb'ecn_mark (\d+)'), int),
+        'target': (re.compile(rb'target ([\d.]+ms)'), _convert_time),
+        'tupdate': (re.compile(rb'tupdate ([\d.]+ms)'), _convert_time),
+        'alpha': (re.compile(rb'alpha ([\d.]+)'), float),
+        'beta': (re.compile(rb'beta ([\d.]+)'), float),
+        'count': (re.compile(rb'count (\d+)'), int),
+        'lastcount': (re.compile(rb'lastcount (\d+)'), int),
+        'ldelay': (re.compile(rb'ldelay ([\d.]+us)'), _convert_time),
+        'drop_next': (re.compile(rb'drop_next ([\d.]+us)'), _convert_time),
+        'maxpacket': (re.compile(rb'maxpacket (\d+)'), int),
+        'drop_overlimit': (re.compile(rb'drop_overlimit (\d+)'), int),
+        'interval': (re.compile(rb'interval ([\d.]+ms)'), _convert_time),
+        'delay_c': (re.compile(rb'delay_c ([\d.]+us)'), _convert_time),
+        'delay_l': (re.compile(rb'delay_l ([\d.]+us)'), _convert_time),
+        'pkts_in_c': (re.compile(rb'pkts_in_c (\d+)'), int),
+        'pkts_in_l': (re.compile(rb'pkts_in_l (\d+)'), int),
+        'step_marks': (re.compile(rb'step_marks (\d+)'), int),
+        'credit': (re.compile(rb'credit (-?\d+)'), int),
+        'coupling_factor': (re.compile(rb'coupling_factor (\d+)'), int),
+        'new_flow_count': (re.compile(rb'new_flow_count (\d+)'), int),
+        'new_flows_len': (re.compile(rb'new_flows_len (\d+)'), int),
+        'old_flows_len': (re.compile(rb'old_flows_len (\d+)'), int),
+        'quantum': (re.compile(rb'quantum (\d+)'), int),
+        'memory_limit': (re.compile(rb'memory_limit (\d+(?:\.\d+)?[KkMGT]?)'), _convert_size),
+        'drop_batch': (re.compile(rb'drop_batch (\d+)'), int)
+    }
 
-    def _parse_common_metrics(self, content):
-        """Extract metrics common to all qdisc types"""
-        common_metrics = {
-            'sent_bytes': (r'Sent (\d+) bytes', int),
-            'sent_pkts': (r'Sent \d+ bytes (\d+) pkt', int),
-            'dropped': (r'dropped (\d+)', int),
-            'overlimits': (r'overlimits (\d+)', int),
-            'requeues': (r'requeues (\d+)', int),
-            'backlog_bytes': (r'backlog (\d+)b', int),
-            'backlog_pkts': (r'backlog \d+b (\d+)p', int)
-        }
-        
-        return {
-            field: self._extract_metric(content, pattern, conv)
-            for field, (pattern, conv) in common_metrics.items()
-        }
+    _COMMON_FIELDS = (
+        'sent_bytes', 'sent_pkts', 'dropped', 'overlimits',
+        'requeues', 'backlog_bytes', 'backlog_pkts'
+    )
 
-    def _parse_pie_metrics(self, content):
-        """Extract PIE-specific metrics"""
-        pie_metrics = {
-            'prob': (r'prob (\d+)', float),
-            'delay': (r'delay ([\d.]+(?:us|ms))', self._convert_time),
-            'pkts_in': (r'pkts_in (\d+)', int),
-            'pkts_overlimit': (r'overlimit (\d+)', int),
-            'maxq': (r'maxq (\d+)', int),
-            'ecn_mark': (r'ecn_mark (\d+)', int),
-            'target': (r'target ([\d.]+ms)', self._convert_time),
-            'tupdate': (r'tupdate ([\d.]+ms)', self._convert_time),
-            'alpha': (r'alpha (\d+)', int),
-            'beta': (r'beta (\d+)', int)
-        }
-        
-        return {
-            field: self._extract_metric(content, pattern, conv)
-            for field, (pattern, conv) in pie_metrics.items()
-        }
+    # One generated parser per qdisc type, covering the common fields as well
+    _PARSERS = {
+        'pie': _compile_parser(_FIELD_PATTERNS, _COMMON_FIELDS + (
+            'prob', 'delay', 'pkts_in', 'pkts_overlimit', 'maxq', 'ecn_mark',
+            'target', 'tupdate', 'alpha', 'beta'
+        )),
+        'codel': _compile_parser(_FIELD_PATTERNS, _COMMON_FIELDS + (
+            'count', 'lastcount', 'ldelay', 'drop_next', 'maxpacket', 'ecn_mark',
+            'drop_overlimit', 'target', 'interval'
+        )),
+        'dualpi2': _compile_parser(_FIELD_PATTERNS, _COMMON_FIELDS + (
+            'prob', 'delay_c', 'delay_l', 'pkts_in_c', 'pkts_in_l', 'maxq', 'ecn_mark',
+            'step_marks', 'credit', 'target', 'tupdate', 'alpha', 'beta', 'coupling_factor'
+        )),
+        'fq_codel': _compile_parser(_FIELD_PATTERNS, _COMMON_FIELDS + (
+            'maxpacket', 'drop_overlimit', 'new_flow_count', 'ecn_mark', 'new_flows_len',
+            'old_flows_len', 'target', 'interval', 'quantum', 'memory_limit', 'drop_batch'
+        ))
+    }
 
-    def _parse_codel_metrics(self, content):
-        """Extract CoDel-specific metrics"""
-        codel_metrics = {
-            'count': (r'count (\d+)', int),
-            'lastcount': (r'lastcount (\d+)', int),
-            'ldelay': (r'ldelay ([\d.]+us)', self._convert_time),
-            'drop_next': (r'drop_next ([\d.]+us)', self._convert_time),
-            'maxpacket': (r'maxpacket (\d+)', int),
-            'ecn_mark': (r'ecn_mark (\d+)', int),
-            'drop_overlimit': (r'drop_overlimit (\d+)', int),
-            'target': (r'target ([\d.]+ms)', self._convert_time),
-            'interval': (r'interval ([\d.]+ms)', self._convert_time)
-        }
-        
-        return {
-            field: self._extract_metric(content, pattern, conv)
-            for field, (pattern, conv) in codel_metrics.items()
-        }
+    # Fixed output schema: base columns first, then every qdisc and throughput field
+    _BASE_COLUMNS = (
+        'test_id', 'timestamp', 'data_source', 'origin',
+        'interface', 'metric_type', 'qdisc_type'
+    )
+    _THROUGHPUT_COLUMNS = ('downloaded_bytes', 'total_size_bytes', 'throughput_bps', 'progress_pct')
+    _COLUMNS = _BASE_COLUMNS + tuple(_FIELD_PATTERNS) + _THROUGHPUT_COLUMNS
 
-    def _parse_dualpi2_metrics(self, content):
-        """Extract DualPI2-specific metrics"""
-        dualpi2_metrics = {
-            'prob': (r'prob ([\d.]+)', float),
-            'delay_c': (r'delay_c ([\d.]+us)', self._convert_time),
-            'delay_l': (r'delay_l ([\d.]+us)', self._convert_time),
-            'pkts_in_c': (r'pkts_in_c (\d+)', int),
-            'pkts_in_l': (r'pkts_in_l (\d+)', int),
-            'maxq': (r'maxq (\d+)', int),
-            'ecn_mark': (r'ecn_mark (\d+)', int),
-            'step_marks': (r'step_marks (\d+)', int),
-            'credit': (r'credit (-?\d+)', int),
-            'target': (r'target ([\d.]+ms)', self._convert_time),
-            'tupdate': (r'tupdate ([\d.]+ms)', self._convert_time),
-            'alpha': (r'alpha ([\d.]+)', float),
-            'beta': (r'beta ([\d.]+)', float),
-            'coupling_factor': (r'coupling_factor (\d+)', int)
-        }
-        
-        return {
-            field: self._extract_metric(content, pattern, conv)
-            for field, (pattern, conv) in dualpi2_metrics.items()
-        }
+    # Throughput logs are split on the summary header; the progress line is then
+    # matched inside its own record, without DOTALL backtracking across the file
+    _THROUGHPUT_MARKER = '*** Download Progress Summary as of '
+    _PROGRESS_PATTERN = re.compile(
+        r'\[#\w+ (\d+\.?\d*)([KMGT]?iB)/(\d+\.?\d*)([KMGT]?iB).*?'
+        r'DL:(\d+\.?\d*)([KMGT]?iB)'
+    )
 
-    def _parse_fq_codel_metrics(self, content):
-        """Extract FQ_CoDel-specific metrics"""
-        fq_codel_metrics = {
-            'maxpacket': (r'maxpacket (\d+)', int),
-            'drop_overlimit': (r'drop_overlimit (\d+)', int),
-            'new_flow_count': (r'new_flow_count (\d+)', int),
-            'ecn_mark': (r'ecn_mark (\d+)', int),
-            'new_flows_len': (r'new_flows_len (\d+)', int),
-            'old_flows_len': (r'old_flows_len (\d+)', int),
-            'target': (r'target ([\d.]+ms)', self._convert_time),
-            'interval': (r'interval ([\d.]+ms)', self._convert_time),
-            'quantum': (r'quantum (\d+)', int),
-            'memory_limit': (r'memory_limit (\d+\w+)', lambda x: self._convert_units(float(x[:-1]), x[-1:])),
-            'drop_batch': (r'drop_batch (\d+)', int)
-        }
-        
-        return {
-            field: self._extract_metric(content, pattern, conv)
-            for field, (pattern, conv) in fq_codel_metrics.items()
-        }
+    _BLOCK_START = re.compile(rb'^qdisc (\w+)', re.MULTILINE)
 
-    def _parse_qdisc_content(self, content):
-        """Parse qdisc content and return metrics"""
-        qdisc_match = re.match(r'qdisc (\w+)', content)
-        if not qdisc_match:
-            return None
-            
-        qdisc_type = qdisc_match.group(1).lower()
+    @classmethod
+    def _iter_qdisc_blocks(cls, buf):
+        """Yield (qdisc type, start, end) for every block of tc output (bytes or mmap)"""
+        starts = [(match.start(), match.group(1)) for match in cls._BLOCK_START.finditer(buf)]
+        ends = [start for start, _ in starts[1:]] + [len(buf)]
+        for (start, qdisc_type), end in zip(starts, ends):
+            yield qdisc_type.decode().lower(), start, end
+
+    def _parse_qdisc_content(self, content, qdisc_type, start, end, header):
+        """Parse the qdisc block at content[start:end] on top of a copy of the per-file header"""
         if qdisc_type not in self.valid_qdisc_types:
             return None
 
-        metrics = {
-            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            'qdisc_type': qdisc_type,
-            **self._parse_common_metrics(content)
-        }
-
-        # Add type-specific metrics
-        if qdisc_type == 'pie':
-            metrics.update(self._parse_pie_metrics(content))
-        elif qdisc_type == 'codel':
-            metrics.update(self._parse_codel_metrics(content))
-        elif qdisc_type == 'dualpi2':
-            metrics.update(self._parse_dualpi2_metrics(content))
-        elif qdisc_type == 'fq_codel':
-            metrics.update(self._parse_fq_codel_metrics(content))
-
+        metrics = header.copy()
+        metrics['qdisc_type'] = qdisc_type
+        # Searches are bounded to the block, so the file is never sliced into copies
+        metrics.update(self._PARSERS[qdisc_type](content, start, end))
         return metrics
 
     def _parse_throughput_log(self, content):
         """Parse throughput log content"""
-        pattern = (
-            r'\*\*\* Download Progress Summary as of (.*?) \*\*\*.*?'
-            r'\[#\w+ (\d+\.?\d*)([KMGT]?iB)/(\d+\.?\d*)([KMGT]?iB).*?'
-            r'DL:(\d+\.?\d*)([KMGT]?iB)'
-        )
-        matches = re.findall(pattern, content, re.DOTALL)
-        
         throughput_data = []
-        for match in matches:
+        for record in content.split(self._THROUGHPUT_MARKER)[1:]:
+            timestamp, marker, rest = record.partition(' ***')
+            progress = self._PROGRESS_PATTERN.search(rest) if marker else None
+            if not progress:
+                continue
+            downloaded, dl_unit, total, total_unit, rate, rate_unit = progress.groups()
             throughput_data.append({
-                'timestamp': datetime.strptime(match[0], '%a %b %d %H:%M:%S %Y'),
-                'downloaded_bytes': self._convert_units(float(match[1]), match[2]),
-                'total_size_bytes': self._convert_units(float(match[3]), match[4]),
-                'throughput_bps': self._convert_units(float(match[5]), match[6]) * 8,
-                'progress_pct': (float(match[1]) / float(match[3])) * 100 if float(match[3]) > 0 else 0
+                'timestamp': datetime.strptime(timestamp, '%a %b %d %H:%M:%S %Y'),
+                'downloaded_bytes': self._convert_units(float(downloaded), dl_unit),
+                'total_size_bytes': self._convert_units(float(total), total_unit),
+                'throughput_bps': self._convert_units(float(rate), rate_unit) * 8,
+                'progress_pct': (float(downloaded) / float(total)) * 100 if float(total) > 0 else 0
             })
         return throughput_data
 
+    def _append_row(self, metrics):
+        """Append one row of metrics to the column store"""
+        for name, column in self.columns.items():
+            column.append(metrics.get(name))
+        self.row_count += 1
+
+    def _read_qdisc_file(self, file_path, source):
+        """Parse every qdisc block of one file (runs in a worker process)"""
+        file_metrics = []
+        header = {'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), **source}
+        with open(file_path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return file_metrics
+            # Map the file and scan raw bytes: the patterns are ASCII, so no decode pass
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                for qdisc_type, start, end in self._iter_qdisc_blocks(buf):
+                    metrics = self._parse_qdisc_content(buf, qdisc_type, start, end, header)
+                    if metrics:
+                        file_metrics.append(metrics)
+        return file_metrics
+
     def _process_qdisc_files(self):
         """Process all qdisc files for the simulation"""
         interfaces = ['eth1', 'eth7']
         roles = ['client', 'server']
         
+        jobs = []
         for role in roles:
             for interface in interfaces:
-                file_path = self.sim_dir / role / f"{self.sim_id}_Router_Queue_Size_{role}_{interface}.txt"
-                if not file_path.exists():
+                file_path = os.path.join(
+                    self._sim_str, role, f"{self.sim_id}_Router_Queue_Size_{role}_{interface}.txt"
+                )
+                if not os.path.exists(file_path):
                     print(f"Warning: File not found - {file_path}")
                     continue
-                
-                with open(file_path, 'r') as f:
-                    content = f.read()
-                    for block in content.split('qdisc')[1:]:
-                        metrics = self._parse_qdisc_content('qdisc' + block)
-                        if metrics:
-                            metrics.update({
-                                'test_id': self.sim_id,
-                                'data_source': 'qdisc',
-                                'origin': role,
-                                'interface': interface,
-                                'metric_type': 'queue_metrics'
-                            })
-                            self.results.append(metrics)
+                jobs.append((file_path, {
+                    'test_id': self.sim_id,
+                    'data_source': 'qdisc',
+                    'origin': role,
+                    'interface': interface,
+                    'metric_type': 'queue_metrics'
+                }))
+
+        if not jobs:
+            return
+
+        workers = min(len(jobs), os.cpu_count() or 1)
+        file_paths, sources = zip(*jobs)
+        if workers == 1:
+            # A pool only adds process startup and pickling cost with a single worker
+            for file_metrics in map(self._read_qdisc_file, file_paths, sources):
+                for metrics in file_metrics:
+                    self._append_row(metrics)
+            return
+
+        # Files are independent and regex-bound, so parse them in parallel processes
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for file_metrics in executor.map(self._read_qdisc_file, file_paths, sources):
+                for metrics in file_metrics:
+                    self._append_row(metrics)
+
+    @staticmethod
+    def _find_log_files(log_dir, prefix, suffix):
+        """Yield files named prefix*suffix using a single os.scandir pass"""
+        min_len = len(prefix) + len(suffix)
+        with os.scandir(log_dir) as entries:
+            for entry in entries:
+                name = entry.name
+                if (len(name) >= min_len and name.startswith(prefix)
+                        and name.endswith(suffix) and entry.is_file()):
+                    yield entry.path
 
     def _process_throughput_logs(self):
         """Process throughput logs for the simulation"""
         log_sources = {
-            'client_dos': self.sim_dir / 'output_client_2',
-            'client_juan': self.sim_dir / 'output_client_juan'
+            'client_dos': os.path.join(self._sim_str, 'output_client_2'),
+            'client_juan': os.path.join(self._sim_str, 'output_client_juan')
         }
         
         for origin, log_dir in log_sources.items():
-            if not log_dir.exists():
+            if not os.path.exists(log_dir):
                 print(f"Warning: Log directory not found - {log_dir}")
                 continue
                 
-            for log_file in log_dir.glob(f"F-Stack_Client-{origin.split('_')[-1].capitalize()}_*_{self.sim_id}.txt"):
+            source = {
+                'test_id': self.sim_id,
+                'data_source': 'fstack',
+                'origin': origin,
+                'interface': 'N/A',
+                'metric_type': 'throughput',
+                'qdisc_type': 'N/A'
+            }
+            prefix = f"F-Stack_Client-{origin.split('_')[-1].capitalize()}_"
+            for log_file in self._find_log_files(log_dir, prefix, f"_{self.sim_id}.txt"):
                 with open(log_file, 'r') as f:
                     content = f.read()
                     for metrics in self._parse_throughput_log(content):
-                        metrics.update({
-                            'test_id': self.sim_id,
-                            'data_source': 'fstack',
-                            'origin': origin,
-                            'interface': 'N/A',
-                            'metric_type': 'throughput',
-                            'qdisc_type': 'N/A'
-                        })
-                        self.results.append(metrics)
+                        metrics.update(source)
+                        self._append_row(metrics)
 
     def process(self):
         """Main processing method"""
@@ -253,30 +299,34 @@ class NetworkSimulationProcessor:
         self._process_qdisc_files()
         self._process_throughput_logs()
         
-        if not self.results:
+        if not self.row_count:
             print("Warning: No data was processed")
             return False
             
         return True
 
+    @staticmethod
+    def _write_csv(df, output_path):
+        """Write a DataFrame to CSV, using pyarrow's C++ writer when it is installed"""
+        if pacsv is None:
+            df.to_csv(output_path, index=False)
+            return
+
+        # The timestamp column mixes qdisc strings and throughput datetimes
+        table = pa.Table.from_pandas(df.astype({'timestamp': str}), preserve_index=False)
+        pacsv.write_csv(table, output_path, write_options=pacsv.WriteOptions(batch_size=65536))
+
     def save_results(self, output_dir=None):
         """Save processed results to CSV"""
-        if not self.results:
+        if not self.row_count:
             print("Error: No results to save")
             return None
             
-        df = pd.DataFrame(self.results)
-        
-        # Ensure consistent column order
-        base_columns = [
-            'test_id', 'timestamp', 'data_source', 'origin', 
-            'interface', 'metric_type', 'qdisc_type'
-        ]
-        other_columns = [col for col in df.columns if col not in base_columns]
-        df = df[base_columns + other_columns]
+        # Columns already follow _COLUMNS, so no reordering or key inference is needed
+        df = pd.DataFrame(self.columns)
         
         output_path = Path(output_dir or self.sim_dir) / f"{self.sim_id}_metrics.csv"
-        df.to_csv(output_path, index=False)
+        self._write_csv(df, output_path)
         
         print(f"\nResults saved to: {output_path}")
         return output_path